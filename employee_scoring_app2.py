@@ -1,28 +1,23 @@
 import streamlit as st
 import pandas as pd
-import matplotlib.pyplot as plt
-import io
-import matplotlib as mpl
-import matplotlib.font_manager as fm  # Import font_manager
+import numpy as np
+import pyarrow as pa
+import altair as alt
+from dataclasses import dataclass
 from datetime import date
+from types import MappingProxyType
 
-# --- Matplotlib 中文字体设置 (增强版) ---
-# 尝试设置中文字体，优先使用用户系统可能存在的字体
-# 增加了更多在Linux环境下常见的开源中文字体，如文泉驿系列
-plt.rcParams['font.sans-serif'] = [
-    'SimHei', 'Microsoft YaHei', 'FangSong',  # Windows/常见字体
-    'WenQuanYi Zen Hei', 'Noto Sans CJK SC', 'Source Han Sans SC',  # Linux/通用中文字体
-    'Arial Unicode MS'  # 某些系统可能有的通用Unicode字体
-]
-plt.rcParams['axes.unicode_minus'] = False  # 解决负号'-'显示为方块的问题
+try:
+    import numba
+except ImportError:  # Numba is optional; scoring falls back to the NumPy implementation without it
+    numba = None
 
-# 移除了 fm.fontManager.rebuild()，因为它可能在Streamlit Cloud环境中导致问题。
-# Matplotlib通常能够自行识别并使用可用的字体。
-# --- 字体设置结束 ---
+# 图表使用 Altair (Vega-Lite) 在浏览器端渲染，中文字体由浏览器处理，
+# 服务端无需再配置 Matplotlib 字体或扫描字体目录。
 
 
-# Define error types and their corresponding penalty points based on severity
-ERROR_PENALTIES = {
+# Define error types and their corresponding penalty points based on severity (read-only)
+ERROR_PENALTIES = MappingProxyType({
     "安全隐患": 30,  # Extremely severe
     "未按规定处理废弃物": 15,  # High severity (environmental, safety)
     "未做好交接/记录": 12,  # High severity (accountability, traceability)
@@ -38,64 +33,103 @@ ERROR_PENALTIES = {
     "工具/器具未归位": 4,  # Low severity (organization, efficiency)
     "文件记录不规范": 3,  # Low severity (compliance, traceability)
     "其他错误": 5,  # Default penalty for unspecified errors
-}
+})
+
+# Integer error codes and the penalty lookup table indexed by them
+ERROR_NAMES = tuple(ERROR_PENALTIES.keys())
+ERROR_CODES = MappingProxyType({name: code for code, name in enumerate(ERROR_NAMES)})
+PENALTY_LUT = np.array([ERROR_PENALTIES[name] for name in ERROR_NAMES], dtype=np.int16)
+
+# Each record stores its error types as a uint16 bitmask, one bit per error code
+ERROR_BITS = MappingProxyType({name: 1 << code for name, code in ERROR_CODES.items()})
+DEFAULT_ERROR_BIT = ERROR_BITS["其他错误"]  # Unknown error types are scored with the "其他错误" penalty
+HAZARD_BIT = ERROR_BITS["安全隐患"]
+
+
+@st.cache_resource(show_spinner=False)
+def get_mask_penalty_lut():
+    """
+    Builds the total penalty of every possible error mask, so scoring needs a single lookup per record.
+
+    Streamlit re-executes the script on every interaction, so the table (2^15 int16 entries, 64 KiB) is built once
+    per server process and shared read-only by all sessions.
+
+    Returns:
+        numpy.ndarray: Read-only int16 array of total penalty points indexed by error mask.
+    """
+    masks = np.arange(1 << len(ERROR_NAMES))
+    mask_penalty_lut = np.zeros(masks.shape[0], dtype=np.int16)
+    for code, penalty in enumerate(PENALTY_LUT):
+        mask_penalty_lut[(masks >> code & 1).astype(bool)] += penalty
+    mask_penalty_lut.flags.writeable = False
+    return mask_penalty_lut
+
+
+# Score DataFrames use Arrow-backed dtypes; dates are set explicitly since convert_dtypes leaves them as objects,
+# and averages since convert_dtypes would narrow them to integers whenever every average happens to be whole
+ARROW_DATE_DTYPE = pd.ArrowDtype(pa.date32())
+ARROW_FLOAT_DTYPE = pd.ArrowDtype(pa.float64())
+
+# Minimum number of records before scoring switches to the Numba kernel, so small batches skip the JIT warmup
+NUMBA_MIN_RECORDS = 1000
 
 # List of predefined error options for the multiselect box (excluding "安全隐患" which is a checkbox)
-PREDEFINED_ERROR_OPTIONS = [
+PREDEFINED_ERROR_OPTIONS = (
     "遗漏清点", "放置不当", "未做好交接/记录", "未挂标识牌", "清洁不彻底",
     "未按规定处理废弃物", "工具/器具未归位", "液封不合格", "文件记录不规范",
     "操作顺序错误", "参数设置错误", "操作不规范", "未及时完成", "其他错误"
-]
+)
+
+
+@dataclass(frozen=True, slots=True)
+class OperationDescription:
+    """A predefined cleanup item (清场项目) and its key operation points (操作要点)."""
+    item: str
+    description: str
+
 
 # Define predefined operation descriptions based on the provided document
-PREDEFINED_OPERATION_DESCRIPTIONS = [
-    {"item": "中间产品", "description": "清点、送规定地点放置，挂状态标识牌，与车间物料员做好交接并在记录上签字"},
-    {"item": "样品瓶", "description": "清点数量后交车间物料员退回中转站保存"},
-    {"item": "废弃物", "description": "清离现场、置垃圾暂存处销毁"},
-    {"item": "文件记录", "description": "与后续产品无关的清离现场"},
-    {"item": "工具器具", "description": "灭菌柜专用小车冲洗、湿抹、消毒或,清扫干净，置规定地点"},
-    {"item": "废物贮器", "description": "冲洗、清扫干净，无积液，,并置规定地点，挂状态标识牌"},
-    {"item": "生产设备", "description": "水浴式灭菌柜清洗消毒，无可见药物残留，,无油污，设备见本色，悬挂状态标识牌"},
-    {"item": "工作场地", "description": "生产场所清扫、湿抹或湿拖干净，,悬挂状态标识符合状态要求"},
-    {"item": "地漏", "description": "清洁、液封"},
-    {"item": "清洁工具", "description": "清洗干净，置规定处存放，挂状态标识牌"},
-]
+PREDEFINED_OPERATION_DESCRIPTIONS = (
+    OperationDescription("中间产品", "清点、送规定地点放置，挂状态标识牌，与车间物料员做好交接并在记录上签字"),
+    OperationDescription("样品瓶", "清点数量后交车间物料员退回中转站保存"),
+    OperationDescription("废弃物", "清离现场、置垃圾暂存处销毁"),
+    OperationDescription("文件记录", "与后续产品无关的清离现场"),
+    OperationDescription("工具器具", "灭菌柜专用小车冲洗、湿抹、消毒或,清扫干净，置规定地点"),
+    OperationDescription("废物贮器", "冲洗、清扫干净，无积液，,并置规定地点，挂状态标识牌"),
+    OperationDescription("生产设备", "水浴式灭菌柜清洗消毒，无可见药物残留，,无油污，设备见本色，悬挂状态标识牌"),
+    OperationDescription("工作场地", "生产场所清扫、湿抹或湿拖干净，,悬挂状态标识符合状态要求"),
+    OperationDescription("地漏", "清洁、液封"),
+    OperationDescription("清洁工具", "清洗干净，置规定处存放，挂状态标识牌"),
+)
 
 # Format options for the selectbox: "清场项目: 操作要点"
-FORMATTED_OPERATION_OPTIONS = [
-    f"{op['item']}: {op['description']}" for op in PREDEFINED_OPERATION_DESCRIPTIONS
-]
+FORMATTED_OPERATION_OPTIONS = tuple(f"{op.item}: {op.description}" for op in PREDEFINED_OPERATION_DESCRIPTIONS)
 
 
 # Simulated Decision Tree/Random Forest logic for scoring
-def calculate_score(completion_degree, error_types_list):
+def apply_score_rules(completion_degree, total_error_penalty, has_hazard):
     """
-    Calculates a single operation's score based on its completion degree and specific error types.
+    Applies the scoring thresholds to an operation's completion degree and total error penalty.
+
+    This is the only definition of the scoring rules: get_score_lut tabulates it for the vectorized path and
+    get_score_kernel compiles it with Numba.
 
     Args:
-        completion_degree (float): Completion degree for this specific operation (0-100).
-        error_types_list (list): A list of error types encountered for this specific operation.
+        completion_degree (int): Completion degree for this specific operation (0-100).
+        total_error_penalty (int): Sum of the penalty points of the operation's error types.
+        has_hazard (bool): Whether the operation has a "安全隐患" error.
 
     Returns:
         int: The calculated score for this operation (0-100).
     """
-    score = completion_degree
-
-    total_error_penalty = 0
-    for error_type in error_types_list:
-        penalty = ERROR_PENALTIES.get(error_type, ERROR_PENALTIES.get("其他错误", 5))
-        total_error_penalty += penalty
-
-    score -= total_error_penalty
+    score = completion_degree - total_error_penalty
 
     # Adjust score based on completion degree thresholds and presence of severe errors
-    has_safety_hazard_in_errors = "安全隐患" in error_types_list
-
     if completion_degree >= 95 and total_error_penalty == 0:
         score = 100
-    elif completion_degree >= 90 and not has_safety_hazard_in_errors:
+    elif completion_degree >= 90 and not has_hazard:
         score = max(85, score)
-    elif completion_degree >= 80 and not has_safety_hazard_in_errors:
+    elif completion_degree >= 80 and not has_hazard:
         score = max(75, score)
     elif completion_degree < 70:
         score = min(score, 60)
@@ -103,6 +137,59 @@ def calculate_score(completion_degree, error_types_list):
     return max(0, min(100, score))
 
 
+@st.cache_resource(show_spinner=False)
+def get_score_lut():
+    """
+    Tabulates apply_score_rules for every hazard flag, total penalty and completion degree once per server process.
+
+    The table has 2 x (max penalty + 1) x 101 int8 entries (about 28 KiB), so the vectorized path scores a batch with
+    a single fancy-indexing lookup instead of restating the thresholds with array operations.
+
+    Returns:
+        numpy.ndarray: Read-only int8 array of scores indexed by [has_hazard, total_error_penalty, completion_degree].
+    """
+    max_penalty = int(PENALTY_LUT.sum())
+    score_lut = np.array([
+        [[apply_score_rules(completion_degree, penalty, bool(has_hazard)) for completion_degree in range(101)]
+         for penalty in range(max_penalty + 1)]
+        for has_hazard in range(2)
+    ], dtype=np.int8)
+    score_lut.flags.writeable = False
+    return score_lut
+
+
+@st.cache_resource(show_spinner=False)
+def get_score_kernel():
+    """
+    Compiles apply_score_rules into a parallel Numba kernel over a batch of records, once per server process.
+
+    Streamlit re-executes the script on every interaction, so the dispatcher is kept as a resource; a decorator at
+    module scope would be rebuilt (and recompiled on first use) on every rerun.
+
+    Returns:
+        callable: kernel(completion, error_masks, mask_penalty_lut, hazard_bit) returning the score of each record,
+        or None if Numba is unavailable or cannot compile it.
+    """
+    if numba is None:
+        return None
+    try:
+        score_rules = numba.njit(apply_score_rules)
+
+        @numba.njit(parallel=True)
+        def score_kernel(completion, error_masks, mask_penalty_lut, hazard_bit):
+            scores = np.empty(completion.shape[0], dtype=np.int64)
+            for i in numba.prange(completion.shape[0]):
+                scores[i] = score_rules(completion[i], mask_penalty_lut[error_masks[i]],
+                                        (error_masks[i] & hazard_bit) != 0)
+            return scores
+
+        # Compile eagerly so a compile failure falls back to the NumPy path instead of raising while scoring
+        score_kernel(np.zeros(1, dtype=np.int64), np.zeros(1, dtype=np.uint16), get_mask_penalty_lut(), HAZARD_BIT)
+    except Exception:  # Numba is optional; any compile problem just disables the kernel
+        return None
+    return score_kernel
+
+
 def evaluate_all_operations(operations_data):
     """
     Calculates scores for each individual operation record.
@@ -111,75 +198,228 @@ def evaluate_all_operations(operations_data):
         operations_data (list of dict): Raw list of operation records.
 
     Returns:
-        pandas.DataFrame: DataFrame with individual operation scores, including employee_id and date.
+        pandas.DataFrame: DataFrame with individual operation scores, including op_id, employee_id and date.
     """
     if not operations_data:
-        return pd.DataFrame(columns=['employee_id', 'date', 'score'])
-
-    scored_ops = []
-    for op in operations_data:
-        score = calculate_score(op['completion_degree'], op['error_types'])
-        scored_ops.append({
-            'employee_id': op['employee_id'],
-            'date': op['date'],
-            'score': score,
-            'operation_description': op['operation_description'],  # Keep for context
-            'error_types': op['error_types']  # Keep for context
-        })
-    return pd.DataFrame(scored_ops)
-
-
-def generate_daily_performance_chart(daily_scores_df, employee_id):
+        return pd.DataFrame(columns=['op_id', 'employee_id', 'date', 'score'])
+
+    ops_df = pd.DataFrame(operations_data)
+    completion = ops_df['completion_degree'].to_numpy(dtype=np.int64)
+    error_masks = ops_df['error_mask'].to_numpy(dtype=np.uint16)
+    mask_penalty_lut = get_mask_penalty_lut()
+
+    score_kernel = get_score_kernel() if len(ops_df) >= NUMBA_MIN_RECORDS else None
+    if score_kernel is not None:
+        score = score_kernel(completion, error_masks, mask_penalty_lut, HAZARD_BIT)
+    else:
+        # Vectorized equivalent of apply_score_rules: one lookup into its tabulated scores per record
+        penalty = mask_penalty_lut[error_masks]
+        has_hazard = (error_masks & HAZARD_BIT) != 0
+        score = get_score_lut()[has_hazard.astype(np.intp), penalty, completion].astype(np.int64)
+
+    # Only narrow key columns are kept; descriptions and errors are looked up by op_id when displayed.
+    # A categorical employee_id lets the later groupby passes hash integer codes instead of Python strings;
+    # the remaining columns are Arrow-backed so Streamlit can hand their buffers to the frontend as-is
+    return pd.DataFrame({
+        'op_id': ops_df['op_id'],
+        'employee_id': ops_df['employee_id'].astype('category'),
+        'date': ops_df['date'],
+        'score': np.clip(score, 0, 100),
+    }).convert_dtypes(dtype_backend='pyarrow').assign(date=lambda df: df['date'].astype(ARROW_DATE_DTYPE))
+
+
+def update_score_totals(new_scores_df, daily_totals, overall_totals):
+    """
+    Adds a batch of newly scored operations to the running score sums and counts.
+
+    A single groupby pass over the batch produces per-(employee, date) sums and counts, which are folded into
+    both running totals, so earlier operations never have to be regrouped.
+
+    Args:
+        new_scores_df (pandas.DataFrame): DataFrame with the individual scores of the new operations.
+        daily_totals (dict): Maps (employee_id, date) to a [score_sum, count] list, updated in place.
+        overall_totals (dict): Maps employee_id to a [score_sum, count] list, updated in place.
+    """
+    batch_totals = new_scores_df.groupby(['employee_id', 'date'], sort=False, observed=True)['score'] \
+        .agg(['sum', 'count'])
+    for (employee_id, op_date), score_sum, count in zip(batch_totals.index, batch_totals['sum'],
+                                                        batch_totals['count']):
+        daily = daily_totals.setdefault((employee_id, op_date), [0, 0])
+        daily[0] += score_sum
+        daily[1] += count
+        overall = overall_totals.setdefault(employee_id, [0, 0])
+        overall[0] += score_sum
+        overall[1] += count
+
+
+def build_average_scores(daily_totals, overall_totals):
+    """
+    Builds the daily and overall average score DataFrames from the running score totals.
+
+    The totals are kept in insertion order; the small result frames are sorted by employee_id (and date) here so the
+    employee selectbox and the bar chart list employees in ID order.
+
+    Args:
+        daily_totals (dict): Maps (employee_id, date) to a [score_sum, count] list.
+        overall_totals (dict): Maps employee_id to a [score_sum, count] list.
+
+    Returns:
+        tuple: (daily_scores_df, overall_scores_df) with 'daily_avg_score' and 'overall_avg_score' columns.
+    """
+    daily_scores_df = pd.DataFrame(
+        [(employee_id, op_date, score_sum / count)
+         for (employee_id, op_date), (score_sum, count) in daily_totals.items()],
+        columns=['employee_id', 'date', 'daily_avg_score']).sort_values(['employee_id', 'date'], ignore_index=True)
+    overall_scores_df = pd.DataFrame(
+        [(employee_id, score_sum / count) for employee_id, (score_sum, count) in overall_totals.items()],
+        columns=['employee_id', 'overall_avg_score']).sort_values('employee_id', ignore_index=True)
+    return (daily_scores_df.convert_dtypes(dtype_backend='pyarrow').astype(
+                {'date': ARROW_DATE_DTYPE, 'daily_avg_score': ARROW_FLOAT_DTYPE}),
+            overall_scores_df.convert_dtypes(dtype_backend='pyarrow').astype(
+                {'overall_avg_score': ARROW_FLOAT_DTYPE}))
+
+
+def format_error_types(error_types):
+    """
+    Formats a record's error types for display.
+
+    Args:
+        error_types (list): The error types of an operation record.
+
+    Returns:
+        str: Comma separated error types in a stable order, or "无" if there are none.
+    """
+    return ", ".join(sorted(error_types)) if error_types else "无"
+
+
+# Operation record fields shown in the "当前已添加的操作记录" table, mapped to their column headers
+OPERATION_DISPLAY_COLUMNS = {
+    'employee_id': '员工ID',
+    'date': '日期',
+    'operation_description': '操作要点描述',
+    'operation_remark': '操作要点备注',
+    'completion_degree': '完成度(%)',
+    'errors_display': '错误类型',
+    'has_safety_hazard_display': '是否存在安全隐患',
+}
+
+
+def build_display_df(operations_data):
+    """
+    Builds the table of entered operation records for display.
+
+    Args:
+        operations_data (list of dict): Raw list of operation records.
+
+    Returns:
+        pandas.DataFrame: The records with display column headers.
+    """
+    display_df = pd.DataFrame(operations_data, columns=list(OPERATION_DISPLAY_COLUMNS)) \
+        .rename(columns=OPERATION_DISPLAY_COLUMNS)
+    for column in ('员工ID', '操作要点描述'):
+        display_df[column] = display_df[column].astype(pd.ArrowDtype(pa.string()))
+    return display_df.convert_dtypes(dtype_backend='pyarrow').astype({'日期': ARROW_DATE_DTYPE})
+
+
+def build_score_detail_df(individual_scores_df, operations_data):
+    """
+    Builds the table of individual operation scores for display.
+
+    Descriptions and errors are stored once, on the raw records, and joined to the narrow score DataFrame by op_id.
+
+    Args:
+        individual_scores_df (pandas.DataFrame): DataFrame with individual operation scores.
+        operations_data (list of dict): Raw list of the scored operation records.
+
+    Returns:
+        pandas.DataFrame: The scores with their descriptions and errors, with display column headers.
+    """
+    op_metadata_df = pd.DataFrame(operations_data, columns=['op_id', 'operation_description', 'errors_display'])
+    return individual_scores_df.merge(op_metadata_df, on='op_id', how='left')[[
+        'employee_id', 'date', 'score', 'operation_description', 'errors_display'
+    ]].rename(columns={
+        'employee_id': '员工ID', 'date': '日期', 'score': '评分',
+        'operation_description': '操作要点', 'errors_display': '错误类型'
+    })
+
+
+# Chart specs are memoized on the score DataFrames (plus the data version) so reruns triggered by unrelated widgets
+# reuse the same chart instead of rebuilding it.
+DATAFRAME_HASH_FUNCS = {pd.DataFrame: lambda df: pd.util.hash_pandas_object(df, index=True).values.tobytes()}
+
+
+@st.cache_data(hash_funcs=DATAFRAME_HASH_FUNCS, show_spinner=False)
+def generate_daily_performance_chart(daily_scores_df, employee_id, data_version=0):
     """
     Generates a line chart for a specific employee's daily performance.
 
     Args:
         daily_scores_df (pandas.DataFrame): DataFrame with daily average scores.
         employee_id (str): The ID of the employee to chart.
+        data_version (int): Score data version, bumped whenever scores are regenerated.
 
     Returns:
-        matplotlib.figure.Figure: The Matplotlib figure object.
+        altair.Chart: The line chart, or None if the employee has no data.
     """
     employee_data = daily_scores_df[daily_scores_df['employee_id'] == employee_id].sort_values('date')
 
     if employee_data.empty:
         return None
 
-    fig, ax = plt.subplots(figsize=(10, 6))
-    ax.plot(employee_data['date'], employee_data['daily_avg_score'], marker='o', linestyle='-', color='blue')
-    ax.set_xlabel('日期', fontsize=12)
-    ax.set_ylabel('每日平均评分 (0-100)', fontsize=12)
-    ax.set_title(f'{employee_id} 每日操作表现折线图', fontsize=14)
-    ax.set_ylim(0, 100)
-    ax.grid(True, linestyle='--', alpha=0.7)
-    plt.xticks(rotation=45, ha='right')
-    plt.tight_layout()
-    return fig
+    employee_data = employee_data.assign(date=pd.to_datetime(employee_data['date']))
+    return alt.Chart(employee_data).mark_line(point=True, color='blue').encode(
+        x=alt.X('date:T', title='日期', axis=alt.Axis(format='%Y-%m-%d', labelAngle=-45)),
+        y=alt.Y('daily_avg_score:Q', title='每日平均评分 (0-100)', scale=alt.Scale(domain=[0, 100])),
+        tooltip=[alt.Tooltip('date:T', title='日期', format='%Y-%m-%d'),
+                 alt.Tooltip('daily_avg_score:Q', title='每日平均评分', format='.1f')]
+    ).properties(title=f'{employee_id} 每日操作表现折线图', height=400)
 
 
-def generate_overall_average_chart(overall_scores_df):
+@st.cache_data(hash_funcs=DATAFRAME_HASH_FUNCS, show_spinner=False)
+def generate_overall_average_chart(overall_scores_df, data_version=0):
     """
     Generates a bar chart comparing overall average scores of all employees.
 
     Args:
         overall_scores_df (pandas.DataFrame): DataFrame with overall average scores per employee.
+        data_version (int): Score data version, bumped whenever scores are regenerated.
 
     Returns:
-        matplotlib.figure.Figure: The Matplotlib figure object.
+        altair.Chart: The bar chart, or None if there is no data.
     """
     if overall_scores_df.empty:
         return None
 
-    fig, ax = plt.subplots(figsize=(10, 6))
-    ax.bar(overall_scores_df['employee_id'], overall_scores_df['overall_avg_score'], color='lightgreen')
-    ax.set_xlabel('员工ID', fontsize=12)
-    ax.set_ylabel('总平均评分 (0-100)', fontsize=12)
-    ax.set_title('所有员工总平均评分对比', fontsize=14)
-    ax.set_ylim(0, 100)
-    ax.grid(axis='y', linestyle='--', alpha=0.7)
-    plt.xticks(rotation=45, ha='right')
-    plt.tight_layout()
-    return fig
+    return alt.Chart(overall_scores_df).mark_bar(color='lightgreen').encode(
+        x=alt.X('employee_id:N', title='员工ID', sort=None, axis=alt.Axis(labelAngle=-45)),
+        y=alt.Y('overall_avg_score:Q', title='总平均评分 (0-100)', scale=alt.Scale(domain=[0, 100])),
+        tooltip=[alt.Tooltip('employee_id:N', title='员工ID'),
+                 alt.Tooltip('overall_avg_score:Q', title='总平均评分', format='.1f')]
+    ).properties(title='所有员工总平均评分对比', height=400)
+
+
+def new_score_store():
+    """
+    Creates an empty store for one session's operation records and scores.
+
+    The store is a single mutable dict kept in st.session_state, so the app reads and resets it in place instead
+    of reassigning individual session_state entries.
+
+    Returns:
+        dict: The empty store.
+    """
+    return {
+        'operations': [],  # Stores raw input data for each operation
+        'individual_op_scores_df': pd.DataFrame(
+            columns=['op_id', 'employee_id', 'date', 'score']),  # Stores score for each individual operation
+        'daily_employee_scores_df': pd.DataFrame(
+            columns=['employee_id', 'date', 'daily_avg_score']),  # Stores daily average scores per employee
+        'overall_employee_scores_df': pd.DataFrame(
+            columns=['employee_id', 'overall_avg_score']),  # Stores overall average scores per employee
+        'scored_op_count': 0,  # Number of leading operations already folded into the scores
+        'daily_score_totals': {},  # Running [score_sum, count] per (employee_id, date)
+        'overall_score_totals': {},  # Running [score_sum, count] per employee_id
+    }
 
 
 # --- Streamlit UI ---
@@ -192,17 +432,13 @@ st.markdown("""
 """)
 
 # Initialize session state for storing operations if not already present
-if 'operations' not in st.session_state:
-    st.session_state.operations = []  # Stores raw input data for each operation
-if 'individual_op_scores_df' not in st.session_state:
-    st.session_state.individual_op_scores_df = pd.DataFrame(
-        columns=['employee_id', 'date', 'score'])  # Stores score for each individual operation
-if 'daily_employee_scores_df' not in st.session_state:
-    st.session_state.daily_employee_scores_df = pd.DataFrame(
-        columns=['employee_id', 'date', 'daily_avg_score'])  # Stores daily average scores per employee
-if 'overall_employee_scores_df' not in st.session_state:
-    st.session_state.overall_employee_scores_df = pd.DataFrame(
-        columns=['employee_id', 'overall_avg_score'])  # Stores overall average scores per employee
+if 'score_store' not in st.session_state:
+    st.session_state.score_store = new_score_store()
+store = st.session_state.score_store
+if 'operations_version' not in st.session_state:
+    st.session_state.operations_version = 0  # Bumped whenever records are added or cleared, keys the cached table
+if 'data_version' not in st.session_state:
+    st.session_state.data_version = 0  # Bumped whenever scores are regenerated or cleared, keys the cached score views
 
 st.header('1. 输入操作数据')
 
@@ -239,102 +475,111 @@ with st.form("operation_input_form"):
             final_error_types = list(selected_error_types)
             if has_safety_hazard:
                 final_error_types.append("安全隐患")
+            error_mask = 0
+            for error_type in final_error_types:
+                error_mask |= ERROR_BITS.get(error_type, DEFAULT_ERROR_BIT)
 
-            st.session_state.operations.append({
+            op_id = len(store['operations'])
+            store['operations'].append({
+                'op_id': op_id,
                 'employee_id': employee_id,
                 'date': operation_date,
                 'operation_description': selected_operation_description,
                 'operation_remark': operation_remark,
                 'completion_degree': completion_degree,
-                'error_types': final_error_types,
-                'has_safety_hazard_display': '是' if has_safety_hazard else '否'
+                'error_mask': error_mask,
+                'has_safety_hazard_display': '是' if has_safety_hazard else '否',
+                'errors_display': format_error_types(final_error_types)
             })
+            st.session_state.operations_version += 1
             st.success(f"已添加 '{employee_id}' 在 {operation_date} 的操作记录。")
         else:
             st.warning("员工ID和操作要点描述不能为空。")
 
 st.subheader('当前已添加的操作记录:')
-if st.session_state.operations:
-    display_df = pd.DataFrame(st.session_state.operations)
-    display_df['错误类型'] = display_df['error_types'].apply(lambda x: ", ".join(x) if x else "无")
-    display_df.rename(columns={
-        'employee_id': '员工ID',
-        'date': '日期',
-        'operation_description': '操作要点描述',
-        'operation_remark': '操作要点备注',
-        'completion_degree': '完成度(%)',
-        'has_safety_hazard_display': '是否存在安全隐患'
-    }, inplace=True)
-    st.dataframe(display_df[[
-        '员工ID', '日期', '操作要点描述', '操作要点备注', '完成度(%)', '错误类型', '是否存在安全隐患'
-    ]])
+if store['operations']:
+    # Reruns that did not add or clear records reuse the last table instead of rebuilding it
+    if st.session_state.get('display_df_version') != st.session_state.operations_version or \
+            'cached_display_df' not in st.session_state:
+        st.session_state.cached_display_df = build_display_df(store['operations'])
+        st.session_state.display_df_version = st.session_state.operations_version
+    st.dataframe(st.session_state.cached_display_df)
 else:
     st.info("暂无操作记录。请添加记录。")
 
 col_buttons = st.columns(2)
 with col_buttons[0]:
     if st.button("清空所有记录"):
-        st.session_state.operations = []
-        st.session_state.individual_op_scores_df = pd.DataFrame(columns=['employee_id', 'date', 'score'])
-        st.session_state.daily_employee_scores_df = pd.DataFrame(columns=['employee_id', 'date', 'daily_avg_score'])
-        st.session_state.overall_employee_scores_df = pd.DataFrame(columns=['employee_id', 'overall_avg_score'])
+        store.update(new_score_store())
+        st.session_state.operations_version += 1
+        st.session_state.data_version += 1
         st.rerun()
 with col_buttons[1]:
     if st.button("开始评分并生成图表"):
-        if not st.session_state.operations:
+        if not store['operations']:
             st.warning("没有可用于评分的数据。请先添加操作记录。")
         else:
-            st.session_state.individual_op_scores_df = evaluate_all_operations(st.session_state.operations)
-
-            if not st.session_state.individual_op_scores_df.empty:
-                st.session_state.daily_employee_scores_df = \
-                st.session_state.individual_op_scores_df.groupby(['employee_id', 'date'])['score'].mean().reset_index()
-                st.session_state.daily_employee_scores_df.rename(columns={'score': 'daily_avg_score'}, inplace=True)
-            else:
-                st.session_state.daily_employee_scores_df = pd.DataFrame(
-                    columns=['employee_id', 'date', 'daily_avg_score'])
-
-            if not st.session_state.individual_op_scores_df.empty:
-                st.session_state.overall_employee_scores_df = \
-                st.session_state.individual_op_scores_df.groupby('employee_id')['score'].mean().reset_index()
-                st.session_state.overall_employee_scores_df.rename(columns={'score': 'overall_avg_score'}, inplace=True)
-            else:
-                st.session_state.overall_employee_scores_df = pd.DataFrame(columns=['employee_id', 'overall_avg_score'])
-
+            # Only score operations added since the last run and fold them into the running totals
+            new_operations = store['operations'][store['scored_op_count']:]
+            if new_operations:
+                new_scores_df = evaluate_all_operations(new_operations)
+                update_score_totals(new_scores_df, store['daily_score_totals'], store['overall_score_totals'])
+
+                if store['individual_op_scores_df'].empty:
+                    store['individual_op_scores_df'] = new_scores_df
+                else:
+                    individual_scores_df = pd.concat([store['individual_op_scores_df'], new_scores_df],
+                                                     ignore_index=True)
+                    # concat falls back to object dtype when the category sets differ
+                    individual_scores_df['employee_id'] = individual_scores_df['employee_id'].astype('category')
+                    store['individual_op_scores_df'] = individual_scores_df
+
+                store['daily_employee_scores_df'], store['overall_employee_scores_df'] = \
+                    build_average_scores(store['daily_score_totals'], store['overall_score_totals'])
+                store['scored_op_count'] = len(store['operations'])
+                st.session_state.data_version += 1
             st.success("评分和图表数据已生成！")
 
 st.header('2. 评分结果与图表分析')
 
-if not st.session_state.individual_op_scores_df.empty:
+if not store['individual_op_scores_df'].empty:
     st.subheader('单次操作评分明细')
-    st.dataframe(st.session_state.individual_op_scores_df[[
-        'employee_id', 'date', 'score', 'operation_description', 'error_types'
-    ]].rename(columns={
-        'employee_id': '员工ID', 'date': '日期', 'score': '评分',
-        'operation_description': '操作要点', 'error_types': '错误类型'
-    }))
+    # Reruns that did not regenerate or clear the scores reuse the last joined table instead of rebuilding it
+    if st.session_state.get('score_detail_df_version') != st.session_state.data_version or \
+            'cached_score_detail_df' not in st.session_state:
+        st.session_state.cached_score_detail_df = build_score_detail_df(
+            store['individual_op_scores_df'], store['operations'][:store['scored_op_count']])
+        st.session_state.score_detail_df_version = st.session_state.data_version
+    st.dataframe(st.session_state.cached_score_detail_df)
 
     st.subheader('员工每日平均表现折线图')
-    all_employees = st.session_state.daily_employee_scores_df['employee_id'].unique()
+    all_employees = store['daily_employee_scores_df']['employee_id'].unique()
     if len(all_employees) > 0:
         selected_employee_for_line_chart = st.selectbox(
             "选择要查看每日表现的员工",
             options=all_employees,
             key="select_employee_line_chart"
         )
-        line_chart_fig = generate_daily_performance_chart(st.session_state.daily_employee_scores_df,
-                                                          selected_employee_for_line_chart)
-        if line_chart_fig:
-            st.pyplot(line_chart_fig)
+        # Reruns from unrelated widgets reuse the last chart without rehashing the daily scores
+        daily_chart_key = (selected_employee_for_line_chart, st.session_state.data_version)
+        if st.session_state.get('last_daily_chart_key') != daily_chart_key or \
+                'cached_daily_chart' not in st.session_state:
+            st.session_state.cached_daily_chart = generate_daily_performance_chart(
+                store['daily_employee_scores_df'], selected_employee_for_line_chart, st.session_state.data_version)
+            st.session_state.last_daily_chart_key = daily_chart_key
+        line_chart = st.session_state.cached_daily_chart
+        if line_chart is not None:
+            st.altair_chart(line_chart, use_container_width=True)
         else:
             st.info(f"员工 {selected_employee_for_line_chart} 暂无每日评分数据。")
     else:
         st.info("暂无员工每日评分数据。")
 
     st.subheader('所有员工总平均评分柱状图')
-    bar_chart_fig = generate_overall_average_chart(st.session_state.overall_employee_scores_df)
-    if bar_chart_fig:
-        st.pyplot(bar_chart_fig)
+    bar_chart = generate_overall_average_chart(store['overall_employee_scores_df'],
+                                               st.session_state.data_version)
+    if bar_chart is not None:
+        st.altair_chart(bar_chart, use_container_width=True)
     else:
         st.info("暂无员工总平均评分数据。")
 else: